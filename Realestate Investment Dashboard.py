@@ -8,8 +8,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import hashlib
 from datetime import datetime
 
+from cpi_forecast import load_cpi_forecast, monthly_index, months_since_origin
+from response_cache import install_response_cache
+
 
 COLORS = {
     'primary': '#2196F3',
@@ -52,8 +56,31 @@ property_data['Property'] = property_data['Location'] + ' ' + property_data['Pro
 property_data['Latitude'] = [-33.8915, -33.9005, -33.9200]
 property_data['Longitude'] = [151.2767, 151.2633, 151.2586]
 
+# Inflation forecast produced offline by the CPI notebook; memory-mapped once
+# here so the forecast tab never fits a model. None until an artifact exists.
+CPI_FORECAST = load_cpi_forecast()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 
+# Callback responses are cached and ETagged per dataset version: the expense
+# CSV, the forecast artifact and this file's own code (the callbacks)
+DATASET_VERSION = '-'.join([
+    file_hash('investment_property_expenses.csv')[:16],
+    str(CPI_FORECAST['meta']['version']) if CPI_FORECAST is not None else 'no-forecast',
+    file_hash(__file__)[:16],
+])
+install_response_cache(app.server, DATASET_VERSION)
+
 # Custom CSS
 app.index_string = '''
 <!DOCTYPE html>
@@ -672,27 +699,45 @@ def create_financial_forecast(df, properties, forecast_months=12):
     filtered_df = df[df['Location'].isin(properties)]
     
     # Calculate historical monthly income
-    monthly_income = filtered_df.groupby('YearMonth')['Net_Income'].mean().reset_index()
-    monthly_income['Growth'] = monthly_income['Net_Income'].pct_change()
-    
-    # Calculate forecast parameters
-    avg_growth_rate = monthly_income['Growth'].mean()
-    growth_std = monthly_income['Growth'].std()
-    last_value = monthly_income['Net_Income'].iloc[-1]
+    monthly_income = filtered_df.groupby('YearMonth')[['Net_Income', 'Gross_Income']].mean().reset_index()
     last_date = pd.to_datetime(monthly_income['YearMonth'].iloc[-1])
-    
-    # Generate forecast
     forecast_dates = pd.date_range(start=last_date, periods=forecast_months+1, freq='M')[1:]
-    forecast_values = []
-    upper_bound = []
-    lower_bound = []
-    current_value = last_value
     
-    for _ in range(forecast_months):
-        current_value *= (1 + avg_growth_rate)
-        forecast_values.append(current_value)
-        upper_bound.append(current_value * (1 + growth_std))
-        lower_bound.append(current_value * (1 - growth_std))
+    factors = None
+    if CPI_FORECAST is not None:
+        # Skip the months between the last CPI quarter and the last data month;
+        # None when the artifact is newer than the data or too stale to reach
+        elapsed = months_since_origin(CPI_FORECAST, last_date)
+        factors = monthly_index(CPI_FORECAST, forecast_months, offset=elapsed)
+    
+    if factors is not None:
+        # Index last month's income and expenses by the CPI forecast in one step:
+        # (2, 1, 1) base values x (3, months) lower/mean/upper index factors.
+        # The notebook publishes headline CPI only, so both sides use it.
+        last = monthly_income.iloc[-1]
+        base = np.array([last['Gross_Income'], last['Gross_Income'] - last['Net_Income']])
+        income, expenses = base[:, None, None] * factors[0]
+        # Net is lowest with low income and high expenses, and the reverse
+        forecast_values = income[1] - expenses[1]
+        lower_bound = income[0] - expenses[2]
+        upper_bound = income[2] - expenses[0]
+        interval_name = f"{CPI_FORECAST['meta']['levels'][0]:.0%} CPI Interval"
+    else:
+        # No usable CPI artifact: naive mean growth rate with a ±1σ band
+        monthly_income['Growth'] = monthly_income['Net_Income'].pct_change()
+        avg_growth_rate = monthly_income['Growth'].mean()
+        growth_std = monthly_income['Growth'].std()
+        current_value = monthly_income['Net_Income'].iloc[-1]
+        
+        forecast_values = []
+        upper_bound = []
+        lower_bound = []
+        for _ in range(forecast_months):
+            current_value *= (1 + avg_growth_rate)
+            forecast_values.append(current_value)
+            upper_bound.append(current_value * (1 + growth_std))
+            lower_bound.append(current_value * (1 - growth_std))
+        interval_name = 'Confidence Interval'
     
     fig = go.Figure()
     
@@ -728,7 +773,7 @@ def create_financial_forecast(df, properties, forecast_months=12):
         fill='tonexty',
         mode='lines',
         line_color='rgba(0,0,0,0)',
-        name='Confidence Interval',
+        name=interval_name,
         fillcolor='rgba(33, 150, 243, 0.2)'
     ))
     
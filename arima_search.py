@@ -0,0 +1,255 @@
+"""Parallel, cached ARIMA order search for the CPI forecaster
+
+Replaces the notebook's serial `itertools.product` loop. Candidate orders
+are fitted in waves of increasing complexity (p + q + P + Q) across a
+process pool. Each fit warm-starts from the parameters of an already
+fitted neighbouring order (one fewer AR/MA term). A warm fit that fails,
+does not converge or scores worse on AIC than its best neighbour (usually
+stuck at the neighbour's optimum) is refitted from statsmodels' default
+start and the lower-AIC result kept; warm starts from the same order's fit
+on older data are only refitted when they fail or do not converge.
+Candidates whose fitted neighbours are all clearly worse than the best
+model so far are pruned. Every fit's AIC/BIC and parameters are stored in SQLite keyed by a hash of
+the series and the order, so re-running on the same data refits nothing and
+re-running after a new quarter warm-starts every order from its last fit
+on the same series.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import cache_path
+
+
+CRITERIA = ('aic', 'bic')
+
+
+def series_hash(y):
+    """Content hash of a series' values and index"""
+    y = pd.Series(y)
+    digest = hashlib.sha256(np.ascontiguousarray(y.to_numpy(dtype=np.float64)).tobytes())
+    digest.update(pd.util.hash_pandas_object(y.index.to_series(), index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class FitStore:
+    """SQLite table of ARIMA fits keyed by (data hash, order, seasonal order)"""
+
+    def __init__(self, path=None):
+        self.path = path or cache_path('arima', 'fits.sqlite')
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS fits ('
+                ' data_hash TEXT, n_obs INTEGER, arima_order TEXT, seasonal_order TEXT,'
+                ' aic REAL, bic REAL, params TEXT, converged INTEGER,'
+                ' PRIMARY KEY (data_hash, arima_order, seasonal_order))'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, data_hash, order, seasonal_order):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT aic, bic, params, converged FROM fits'
+                ' WHERE data_hash = ? AND arima_order = ? AND seasonal_order = ?',
+                (data_hash, json.dumps(order), json.dumps(seasonal_order)),
+            ).fetchone()
+        if row is None:
+            return None
+        return {'aic': row[0], 'bic': row[1], 'params': json.loads(row[2]), 'converged': bool(row[3])}
+
+    def latest_params(self, order, seasonal_order, y):
+        """Parameters from the most recent fit of this order on `y` or a prefix of it
+
+        Only fits whose stored data hash equals the hash of `y`'s first
+        n_obs values count, so another series (e.g. a different CPI
+        sub-index) never seeds the search.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT data_hash, n_obs, params FROM fits'
+                ' WHERE arima_order = ? AND seasonal_order = ? AND n_obs <= ?'
+                ' ORDER BY n_obs DESC',
+                (json.dumps(order), json.dumps(seasonal_order), len(y)),
+            ).fetchall()
+        prefix_hashes = {}
+        for data_hash, n_obs, params in rows:
+            if n_obs not in prefix_hashes:
+                prefix_hashes[n_obs] = series_hash(y.iloc[:n_obs])
+            if prefix_hashes[n_obs] == data_hash:
+                return json.loads(params)
+        return None
+
+    def put(self, data_hash, n_obs, order, seasonal_order, fit):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (data_hash, n_obs, json.dumps(order), json.dumps(seasonal_order),
+                 fit['aic'], fit['bic'], json.dumps(fit['params']), int(fit['converged'])),
+            )
+
+
+def _fit_order(args):
+    """Fit one ARIMA order; runs inside a worker process"""
+    from statsmodels.tsa.arima.model import ARIMA
+
+    y, order, seasonal_order, start_params, benchmark_aic = args
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = ARIMA(y, order=order, seasonal_order=seasonal_order)
+
+    def fit(start):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                return model.fit(start_params=start)
+        except (ValueError, np.linalg.LinAlgError):
+            return None
+
+    best = None
+    if start_params:
+        # Map by parameter name; new AR/MA terms start at zero and sigma2 at the
+        # neighbour's value, which is already close to the optimum
+        start = np.array([start_params.get(name, 0.0) for name in model.param_names])
+        if 'sigma2' in model.param_names and start_params.get('sigma2', 0.0) <= 0:
+            start[model.param_names.index('sigma2')] = np.var(np.diff(np.asarray(y, dtype=float)))
+        best = fit(start)
+
+    # A warm fit that stops at its neighbour's optimum (the new terms stay near
+    # zero) scores worse than that neighbour on AIC even when a better optimum
+    # exists. That, non-convergence or failure falls back to statsmodels'
+    # default start
+    if best is None or not _converged(best) or (benchmark_aic is not None and best.aic > benchmark_aic):
+        cold = fit(None)
+        if cold is not None and (best is None or cold.aic < best.aic):
+            best = cold
+    if best is None:
+        return None
+
+    return {
+        'aic': float(best.aic),
+        'bic': float(best.bic),
+        'params': dict(zip(model.param_names, map(float, best.params))),
+        'converged': _converged(best),
+    }
+
+
+def _converged(result):
+    return bool(result.mle_retvals.get('converged', True)) if result.mle_retvals else True
+
+
+def _neighbours(order, seasonal_order):
+    """Orders with one fewer AR or MA term (regular or seasonal)"""
+    p, d, q = order
+    P, D, Q, s = seasonal_order
+    if p > 0:
+        yield (p - 1, d, q), seasonal_order
+    if q > 0:
+        yield (p, d, q - 1), seasonal_order
+    if P > 0:
+        yield order, (P - 1, D, Q, s)
+    if Q > 0:
+        yield order, (P, D, Q - 1, s)
+
+
+def search_arima(y, p=range(0, 4), d=(1,), q=range(0, 4), seasonal_orders=None,
+                 criterion='aic', prune_margin=10.0, max_workers=None, store=None):
+    """Search ARIMA orders in parallel and return every candidate's outcome
+
+    `seasonal_orders` is a list of (P, D, Q, s) tuples; the default is no
+    seasonal part. A candidate is pruned when it has at least one fitted
+    neighbour and all of them score worse than the current best by more
+    than `prune_margin`. Set
+    `prune_margin=None` to fit the full grid.
+
+    Returns a DataFrame sorted by the criterion with columns order,
+    seasonal_order, aic, bic, converged and status ('fitted', 'cached',
+    'pruned' or 'failed').
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of {CRITERIA}, got '{criterion}'")
+
+    y = pd.Series(y).astype('float64')
+    store = store or FitStore()
+    data_hash = series_hash(y)
+    seasonal_orders = [tuple(s) for s in (seasonal_orders or [(0, 0, 0, 0)])]
+
+    candidates = [((pi, di, qi), so) for pi, di, qi in itertools.product(p, d, q) for so in seasonal_orders]
+    grid = set(candidates)
+    # Fit simple models first so their parameters can seed the larger ones
+    waves = {}
+    for order, so in candidates:
+        waves.setdefault(order[0] + order[2] + so[0] + so[2], []).append((order, so))
+
+    results = {}
+    best = np.inf
+    workers = max_workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for level in sorted(waves):
+            to_fit = []
+            for order, so in waves[level]:
+                cached = store.get(data_hash, order, so)
+                if cached is not None:
+                    results[order, so] = {**cached, 'status': 'cached'}
+                    continue
+
+                in_grid = [nb for nb in _neighbours(order, so) if nb in grid]
+                fitted = [results[nb] for nb in in_grid
+                          if nb in results and results[nb]['status'] in ('fitted', 'cached')]
+                # Orders with no scored neighbour (none in the grid, or all failed or
+                # pruned) have nothing to be judged against and are always fitted
+                if (prune_margin is not None and fitted and
+                        all(nb[criterion] > best + prune_margin for nb in fitted)):
+                    results[order, so] = {'aic': np.nan, 'bic': np.nan, 'params': None,
+                                          'converged': False, 'status': 'pruned'}
+                    continue
+
+                # Warm start: previous fit of this order on older data, else the best
+                # neighbour, whose AIC the warm fit must then beat (see _fit_order)
+                start, benchmark = store.latest_params(order, so, y), None
+                if start is None and fitted:
+                    start = min(fitted, key=lambda nb: nb[criterion])['params']
+                    benchmark = min(nb['aic'] for nb in fitted)
+                to_fit.append(((order, so), (y, order, so, start, benchmark)))
+
+            for (key, _), fit in zip(to_fit, pool.map(_fit_order, [args for _, args in to_fit])):
+                if fit is None:
+                    results[key] = {'aic': np.nan, 'bic': np.nan, 'params': None,
+                                    'converged': False, 'status': 'failed'}
+                    continue
+                store.put(data_hash, len(y), key[0], key[1], fit)
+                results[key] = {**fit, 'status': 'fitted'}
+
+            scores = [r[criterion] for r in results.values() if r['status'] in ('fitted', 'cached')]
+            if scores:
+                best = min(best, min(scores))
+
+    table = pd.DataFrame([
+        {'order': order, 'seasonal_order': so, 'aic': r['aic'], 'bic': r['bic'],
+         'converged': r['converged'], 'status': r['status']}
+        for (order, so), r in results.items()
+    ])
+    return table.sort_values(criterion, na_position='last').reset_index(drop=True)
+
+
+def best_order(table, criterion='aic'):
+    """(order, seasonal_order) of the best fitted candidate in a search table
+
+    Converged fits are preferred; non-converged ones are only considered
+    when nothing converged.
+    """
+    fitted = table[table['status'].isin(['fitted', 'cached'])]
+    if fitted['converged'].any():
+        fitted = fitted[fitted['converged'].astype(bool)]
+    row = fitted.loc[fitted[criterion].idxmin()]
+    return row['order'], row['seasonal_order']
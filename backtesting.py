@@ -0,0 +1,207 @@
+"""Parallel rolling-origin backtesting for the CPI models
+
+Every model family from the CPI notebook (linear trend, TCES, damped TCES,
+ARIMA and the FNN) is evaluated on an expanding window: for each forecast
+origin the model is fitted on all data before it and forecasts the next
+`horizon` quarters. The (model, hyperparameters, origin) jobs run on a
+process pool, and each fold's forecast is cached on disk keyed by the
+training data it saw and the forecaster's code, so adding a quarter only
+runs the new origin and editing a forecaster reruns only its folds.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import cache_path
+from pipeline_runner import code_dependencies
+
+
+def forecast_linear(train, horizon):
+    """Linear trend on the time index, as in the notebook's LinearRegression"""
+    t = np.arange(1, len(train) + 1)
+    slope, intercept = np.polyfit(t, train, 1)
+    return intercept + slope * np.arange(len(train) + 1, len(train) + horizon + 1)
+
+
+def _forecast_ets(train, horizon, damped_trend):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fit = ExponentialSmoothing(train, trend='add', damped_trend=damped_trend).fit()
+    return np.asarray(fit.forecast(horizon))
+
+
+def forecast_tces(train, horizon):
+    return _forecast_ets(train, horizon, damped_trend=False)
+
+
+def forecast_damped_tces(train, horizon):
+    return _forecast_ets(train, horizon, damped_trend=True)
+
+
+def forecast_arima(train, horizon, order=(1, 1, 1)):
+    from statsmodels.tsa.arima.model import ARIMA
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fit = ARIMA(train, order=tuple(order)).fit()
+    return np.asarray(fit.forecast(horizon))
+
+
+def forecast_fnn(train, horizon, time_window=4, batch_size=20, epochs=300,
+                 patience=20, validation_split=0.1, seed=0):
+    """Notebook FNN (Dense(10, relu) -> Dense(1)) with early stopping
+
+    The scaler is fitted on the training window only, and multi-step
+    forecasts are produced recursively from the last `time_window` values.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.layers import Dense
+    from tensorflow.keras.models import Sequential
+
+    tf.random.set_seed(seed)
+    np.random.seed(seed)
+
+    lo, hi = train.min(), train.max()
+    scale = (hi - lo) or 1.0
+    scaled = (train - lo) / scale
+
+    windows = np.lib.stride_tricks.sliding_window_view(scaled[:-1], time_window)
+    targets = scaled[time_window:]
+
+    model = Sequential()
+    model.add(Dense(10, input_dim=time_window, activation='relu'))
+    model.add(Dense(1))
+    model.compile(loss='mean_squared_error', optimizer='adam')
+    early_stop = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+    model.fit(windows, targets, epochs=epochs, batch_size=batch_size,
+              validation_split=validation_split, shuffle=False, verbose=0, callbacks=[early_stop])
+
+    current = list(scaled[-time_window:])
+    predictions = []
+    for _ in range(horizon):
+        next_value = float(model.predict(np.array([current[-time_window:]]), verbose=0)[0, 0])
+        predictions.append(next_value)
+        current.append(next_value)
+    return np.array(predictions) * scale + lo
+
+
+MODEL_FAMILIES = {
+    'linear': forecast_linear,
+    'tces': forecast_tces,
+    'damped_tces': forecast_damped_tces,
+    'arima': forecast_arima,
+    'fnn': forecast_fnn,
+}
+
+# (label, family, hyperparameters) mirroring the notebook's candidates
+DEFAULT_MODELS = [
+    ('Linear_Regression', 'linear', {}),
+    ('TCES', 'tces', {}),
+    ('Damped_TCES', 'damped_tces', {}),
+    ('ARIMA', 'arima', {'order': (1, 1, 1)}),
+] + [
+    ('FNN', 'fnn', {'time_window': time_window, 'batch_size': batch_size})
+    for time_window in (4, 6) for batch_size in (20, 30)
+]
+
+
+def forecaster_version(family):
+    """Hash of the source of a family's forecaster and the project code it uses"""
+    dependencies = code_dependencies(MODEL_FAMILIES[family])
+    return hashlib.sha256(json.dumps(dependencies, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _fold_path(family, version, params, train, horizon):
+    digest = hashlib.sha256(json.dumps([family, version, params, horizon], sort_keys=True, default=list).encode())
+    digest.update(np.ascontiguousarray(train, dtype=np.float64).tobytes())
+    return cache_path('backtest', family, f'{digest.hexdigest()[:20]}.npy')
+
+
+def _run_fold(job):
+    """Fit one model on one training window; runs inside a worker process"""
+    family, params, train, horizon, path = job
+    try:
+        forecast = MODEL_FAMILIES[family](train, horizon, **params)
+    except (ValueError, np.linalg.LinAlgError):
+        forecast = np.full(horizon, np.nan)
+    # Written under a temporary name so a crashed worker never leaves a truncated fold
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        np.save(fh, np.asarray(forecast, dtype=np.float64))
+    os.replace(tmp_path, path)
+    return path
+
+
+def rolling_origins(n_obs, n_origins, horizon, min_train=20):
+    """Expanding-window origins: the last `n_origins` that leave `horizon` points to score"""
+    last = n_obs - horizon
+    first = max(min_train, last - n_origins + 1)
+    if first > last:
+        raise ValueError(f'Series of length {n_obs} is too short for horizon {horizon} with min_train {min_train}')
+    return list(range(first, last + 1))
+
+
+def backtest(y, models=None, n_origins=40, horizon=6, min_train=20, max_workers=None):
+    """Rolling-origin backtest of every model and hyperparameter set
+
+    Returns a long DataFrame with one row per (model, params, origin, step)
+    holding the forecast, the actual value and the error.
+    """
+    models = DEFAULT_MODELS if models is None else models
+    values = pd.Series(y).astype('float64').to_numpy()
+    origins = rolling_origins(len(values), n_origins, horizon, min_train)
+
+    jobs, rows, versions = [], [], {}
+    for label, family, params in models:
+        if family not in MODEL_FAMILIES:
+            raise ValueError(f"Unknown model family '{family}', expected one of {list(MODEL_FAMILIES)}")
+        if family not in versions:
+            versions[family] = forecaster_version(family)
+        for origin in origins:
+            train = values[:origin]
+            path = _fold_path(family, versions[family], params, train, horizon)
+            rows.append((label, family, params, origin, path))
+            if not os.path.exists(path):
+                jobs.append((family, params, train, horizon, path))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+            list(pool.map(_run_fold, jobs))
+
+    records = []
+    for label, family, params, origin, path in rows:
+        forecast = np.load(path)
+        actual = values[origin:origin + horizon]
+        for step, (pred, true) in enumerate(zip(forecast, actual), start=1):
+            records.append({
+                'model': label,
+                'family': family,
+                'params': json.dumps(params, sort_keys=True, default=list),
+                'origin': origin,
+                'horizon': step,
+                'forecast': pred,
+                'actual': true,
+                'error': true - pred,
+            })
+    return pd.DataFrame(records)
+
+
+def comparison_table(folds):
+    """MAE and RMSE per model, hyperparameter set and horizon"""
+    grouped = folds.assign(abs_error=folds['error'].abs(), sq_error=folds['error'] ** 2)
+    summary = grouped.groupby(['model', 'params', 'horizon']).agg(
+        MAE=('abs_error', 'mean'),
+        sq_error=('sq_error', 'mean'),
+        folds=('origin', 'nunique'),
+    )
+    summary['RMSE'] = np.sqrt(summary.pop('sq_error'))
+    return summary[['MAE', 'RMSE', 'folds']].unstack('horizon')
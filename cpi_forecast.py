@@ -0,0 +1,187 @@
+"""Versioned CPI forecast artifacts for the investment dashboard
+
+The CPI notebook fits the inflation models offline; `write_cpi_forecast`
+persists the result as plain .npy arrays plus a meta.json under
+artifacts/cpi_forecast/v<N>/. Every array is stored as a price index
+relative to the last observed quarter (1.0 = today's prices), so the
+dashboard can scale any dollar series by it. `load_cpi_forecast` opens the
+newest version memory-mapped and `monthly_index` turns it into per-month
+factors, aligned to the month the dashboard's data ends, without fitting
+anything.
+"""
+
+import json
+import os
+import shutil
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+ARTIFACT_DIR = os.environ.get('PORTFOLIO_ARTIFACT_DIR', os.path.join('artifacts', 'cpi_forecast'))
+
+# Bump when the artifact layout changes so old readers refuse new files
+ARTIFACT_FORMAT = 1
+
+DEFAULT_LEVELS = (0.8, 0.95)
+
+
+def _versions(root):
+    """Completed versions under root, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    versions = []
+    for name in os.listdir(root):
+        if name.startswith('v') and name[1:].isdigit() and os.path.exists(os.path.join(root, name, 'meta.json')):
+            versions.append(int(name[1:]))
+    return sorted(versions)
+
+
+def _simulate_index(y, order, horizon, n_paths, seed):
+    """Fit ARIMA on one CPI series and simulate index paths from its last value"""
+    from statsmodels.tsa.arima.model import ARIMA
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        result = ARIMA(y, order=tuple(order)).fit()
+        mean = np.asarray(result.forecast(horizon))
+        paths = result.simulate(nsimulations=horizon, repetitions=n_paths, anchor='end',
+                                rng=np.random.default_rng(seed))
+    # (horizon, 1, n_paths) -> (n_paths, horizon)
+    paths = np.asarray(paths).reshape(horizon, n_paths).T
+    return mean / y[-1], paths / y[-1]
+
+
+def write_cpi_forecast(cpi, order=(1, 1, 1), horizon=8, levels=DEFAULT_LEVELS,
+                       n_paths=2000, seed=0, root=ARTIFACT_DIR):
+    """Fit, simulate and persist a new artifact version
+
+    `cpi` is a quarterly Series or a DataFrame of several aligned series
+    (for example headline CPI plus rent and housing-cost sub-indices); each
+    column gets its own ARIMA fit. Writes:
+
+    - mean.npy       (n_series, horizon)                point forecast
+    - paths.npy      (n_series, n_paths, horizon)       simulated paths
+    - intervals.npy  (n_series, n_levels, 2, horizon)   path quantiles
+
+    The version directory is assembled under a temporary name and renamed
+    into place, so a reader never sees a half-written version. Returns the
+    new version number.
+    """
+    # Imported here so loading an artifact (the dashboard) needs no cache stack
+    from arima_search import series_hash
+
+    frame = cpi.to_frame() if isinstance(cpi, pd.Series) else cpi
+    frame = frame.astype('float64').dropna()
+    levels = tuple(float(level) for level in levels)
+
+    means, paths = [], []
+    for i, column in enumerate(frame.columns):
+        mean, simulated = _simulate_index(frame[column].to_numpy(), order, horizon, n_paths, seed + i)
+        means.append(mean)
+        paths.append(simulated)
+    means, paths = np.stack(means), np.stack(paths)
+
+    quantiles = [q for level in levels for q in ((1 - level) / 2, (1 + level) / 2)]
+    intervals = np.quantile(paths, quantiles, axis=1)                        # (2 * levels, series, horizon)
+    intervals = intervals.reshape(len(levels), 2, *intervals.shape[1:]).transpose(2, 0, 1, 3)
+
+    versions = _versions(root)
+    version = versions[-1] + 1 if versions else 1
+    final_dir = os.path.join(root, f'v{version}')
+    tmp_dir = os.path.join(root, f'.v{version}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, 'mean.npy'), means)
+    np.save(os.path.join(tmp_dir, 'paths.npy'), paths)
+    np.save(os.path.join(tmp_dir, 'intervals.npy'), intervals)
+
+    last_period = frame.index[-1]
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'model': 'arima',
+        'order': list(order),
+        'series': [str(column) for column in frame.columns],
+        'last_period': last_period.isoformat() if hasattr(last_period, 'isoformat') else str(last_period),
+        'last_value': frame.iloc[-1].tolist(),
+        'data_hash': [series_hash(frame[column]) for column in frame.columns],
+        'freq': 'Q',
+        'horizon': horizon,
+        'levels': list(levels),
+        'n_paths': n_paths,
+    }
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh, indent=2)
+
+    os.rename(tmp_dir, final_dir)
+    return version
+
+
+def load_cpi_forecast(root=ARTIFACT_DIR, version=None):
+    """Open an artifact version memory-mapped; the newest one by default
+
+    Returns a dict with 'meta' and the 'mean', 'paths' and 'intervals'
+    arrays, or None when no artifact has been produced yet.
+    """
+    versions = _versions(root)
+    if not versions:
+        return None
+    version = versions[-1] if version is None else version
+    directory = os.path.join(root, f'v{version}')
+
+    with open(os.path.join(directory, 'meta.json')) as fh:
+        meta = json.load(fh)
+    if meta.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Artifact v{version} has format {meta.get('format')}, expected {ARTIFACT_FORMAT}")
+
+    artifact = {'meta': meta}
+    for name in ('mean', 'paths', 'intervals'):
+        artifact[name] = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+    return artifact
+
+
+def months_since_origin(artifact, period):
+    """Whole months from the artifact's last observed quarter to `period`
+
+    Quarters are dated by their final month (2022-12-01 for Q4 2022), so a
+    dashboard whose data ends in 2023-12 is 12 months past that origin.
+    """
+    origin = pd.Timestamp(artifact['meta']['last_period'])
+    period = pd.Timestamp(period)
+    return (period.year - origin.year) * 12 + period.month - origin.month
+
+
+def monthly_index(artifact, n_months, level=None, offset=0):
+    """Per-month (lower, mean, upper) index factors for every series
+
+    Quarterly factors sit at months 3, 6, 9, ... after the forecast origin
+    (where the factor is 1) and are interpolated in log space in between.
+    `offset` is the number of months already elapsed since the origin
+    (see `months_since_origin`): the factors then cover months offset + 1
+    to offset + n_months and are rebased to the mean factor at `offset`,
+    so they scale values observed `offset` months after the origin.
+    Returns an array of shape (n_series, 3, n_months), or None when the
+    artifact starts after `offset` or does not reach that far ahead.
+    """
+    meta = artifact['meta']
+    if offset < 0 or offset + n_months > 3 * meta['horizon']:
+        return None
+    level = meta['levels'][0] if level is None else level
+    band = meta['levels'].index(level)
+
+    intervals = artifact['intervals'][:, band]                                 # (series, 2, horizon)
+    quarterly = np.stack([intervals[:, 0], artifact['mean'], intervals[:, 1]], axis=1)
+    quarterly = np.log(np.concatenate([np.ones(quarterly.shape[:2] + (1,)), quarterly], axis=2))
+
+    position = np.arange(offset, offset + n_months + 1) / 3
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, quarterly.shape[2] - 1)
+    weight = position - lower
+    factors = np.exp(quarterly[..., lower] * (1 - weight) + quarterly[..., upper] * weight)
+    # The value at `offset` is observed, so every band is rebased to its expected index
+    return factors[..., 1:] / factors[:, 1:2, :1]
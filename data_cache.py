@@ -0,0 +1,190 @@
+"""Cached columnar ingestion for the notebooks' Excel workbooks
+
+The first read of a workbook goes through openpyxl as before; the typed
+result is then written to an uncompressed Arrow/Feather file keyed by the
+workbook's content hash. Later reads memory-map that file instead.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+CACHE_DIR = os.environ.get('PORTFOLIO_CACHE_DIR', '.cache')
+
+# Bump when the coercion rules change so stale caches are not reused
+INGEST_VERSION = 2
+
+NOT_REVIEWED = ['Not Reviewed', 'not reviewed']
+BOOLEAN_VALUES = {'t': True, 'f': False}
+NUMERIC_COLUMNS = ['review_frequency', 'days_since_last_review', 'listing_age (in days)']
+CURRENCY_COLUMNS = ['price']
+# The notebook maps 'Not Reviewed' in these itself (to 0 in some cells, NaN in
+# others, after filling blanks), so the markers are kept as strings
+MARKER_COLUMNS = ['days_since_last_review']
+MARKER_PREFIXES = ('review_scores_',)
+
+
+def cache_path(*parts):
+    """Path inside the shared cache directory, creating parent folders"""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _text_columns(df):
+    """Columns holding Python objects or strings"""
+    return [col for col in df.columns
+            if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])]
+
+
+def _keeps_markers(col):
+    return col in MARKER_COLUMNS or str(col).startswith(MARKER_PREFIXES)
+
+
+def _to_numeric_keeping_markers(values):
+    """Floats, with 'Not Reviewed' markers left in place as strings"""
+    is_marker = values.isin(NOT_REVIEWED)
+    numeric = pd.to_numeric(values.where(~is_marker), errors='coerce')
+    if not is_marker.any():
+        return numeric
+    return numeric.astype(object).where(~is_marker, values)
+
+
+def coerce_listings(df):
+    """Apply the dtype fixes the Airbnb notebook repeats by hand
+
+    - 'Not Reviewed' markers become NaN, except in the review score and
+      days_since_last_review columns, where the notebook's own cells
+      replace them and they stay as strings
+    - columns holding only 't'/'f' become nullable booleans
+    - review scores and other numeric-looking columns become floats
+    - currency strings such as '$1,200.00' become floats
+    """
+    df = df.copy()
+    object_cols = _text_columns(df)
+    replace_cols = [col for col in object_cols if not _keeps_markers(col)]
+    if replace_cols:
+        df[replace_cols] = df[replace_cols].replace(NOT_REVIEWED, np.nan)
+
+    for col in object_cols:
+        values = df[col].dropna()
+        if len(values) and values.isin(list(BOOLEAN_VALUES)).all():
+            df[col] = df[col].map(BOOLEAN_VALUES).astype('boolean')
+
+    numeric = [col for col in df.columns
+               if str(col).startswith('review_scores_') or col in NUMERIC_COLUMNS]
+    for col in numeric:
+        if _keeps_markers(col):
+            df[col] = _to_numeric_keeping_markers(df[col])
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in CURRENCY_COLUMNS:
+        if col in object_cols:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[\$,]', '', regex=True), errors='coerce')
+
+    return df
+
+
+def _to_arrow_safe(df):
+    """Make leftover mixed-type object columns representable in Arrow
+
+    Numbers mixed with a few strings (review scores with 'Not Reviewed')
+    are stored as floats, and the strings are returned as {column name:
+    {row position: value}} so `_read_feather` can put them back. Any other
+    mix is stored as strings.
+    """
+    df = df.copy()
+    text_values = {}
+    for col in _text_columns(df):
+        values = df[col].dropna()
+        if values.map(type).nunique() <= 1:
+            continue
+        is_text = df[col].map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        numbers = pd.to_numeric(df[col].where(~is_text), errors='coerce')
+        if numbers.notna().sum() == (~is_text & df[col].notna().to_numpy()).sum():
+            text_values[str(col)] = {str(i): v for i, v in zip(np.flatnonzero(is_text), df[col][is_text])}
+            df[col] = numbers
+        else:
+            df[col] = df[col].astype('string')
+    return df, text_values
+
+
+def _write_feather(df, path):
+    safe, text_values = _to_arrow_safe(df)
+    table = pa.Table.from_pandas(safe, preserve_index=False)
+    # Feather stores string column names only, so keep the originals (e.g. the
+    # integer headers of header=None sheets) in the schema metadata
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'portfolio_columns'] = json.dumps(list(df.columns), default=str).encode()
+    metadata[b'portfolio_text_values'] = json.dumps(text_values).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def _read_feather(path, columns=None):
+    table = feather.read_table(path, memory_map=True)
+    df = table.to_pandas()
+    metadata = table.schema.metadata or {}
+    for name, values in json.loads(metadata.get(b'portfolio_text_values', b'{}')).items():
+        column = df[name].astype(object)
+        column.iloc[[int(i) for i in values]] = list(values.values())
+        df[name] = column
+    stored = metadata.get(b'portfolio_columns')
+    if stored is not None:
+        df.columns = json.loads(stored)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def read_excel_cached(path, sheet_name=0, header=0, coerce=True, columns=None):
+    """Drop-in replacement for pd.read_excel backed by a columnar cache
+
+    The cache key covers the workbook bytes, the sheet, the header row and
+    whether listing coercions were applied, so editing the workbook or
+    changing the arguments triggers a single re-parse.
+    """
+    key = hashlib.sha256(json.dumps(
+        [file_hash(path), sheet_name, header, coerce, INGEST_VERSION], default=str
+    ).encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    cached = cache_path('ingest', f'{stem}-{key}.feather')
+
+    if not os.path.exists(cached):
+        df = pd.read_excel(path, sheet_name=sheet_name, header=header, engine='openpyxl')
+        if coerce:
+            df = coerce_listings(df)
+        _write_feather(df, cached)
+
+    return _read_feather(cached, columns=columns)
+
+
+def read_listings(path='listings.xlsx', columns=None):
+    """Typed Airbnb listings table"""
+    return read_excel_cached(path, coerce=True, columns=columns)
+
+
+def read_cashrate(path='cashrate_data.xlsx'):
+    """Historical and outlook cash rate sheets used by the CPI notebook"""
+    historical = read_excel_cached(path, sheet_name='Historical', coerce=False)
+    outlook = read_excel_cached(path, sheet_name='Outlook', header=None, coerce=False)
+    return historical, outlook
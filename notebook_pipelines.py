@@ -0,0 +1,154 @@
+"""Stage definitions for the three notebooks' processing steps
+
+Each notebook's load -> clean -> feature -> fit chain is declared as
+`Stage`s over the shared modules, so `run_notebook('airbnb')` reruns only
+the steps whose code, parameters or input files changed. This is a
+standalone entry point: the notebooks themselves do not call it and still
+run their cells top to bottom.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from arima_search import best_order, search_arima
+from backtesting import backtest, comparison_table
+from cpi_forecast import ARTIFACT_DIR, write_cpi_forecast
+from data_cache import read_cashrate, read_listings
+from listings_cleaning import default_listings_pipeline
+from pipeline_runner import Pipeline, Stage
+from revenue_optimisation import RevenueOptimiser
+from seasonal_decomposition import decompose
+from spatial_features import add_spatial_features
+from tenant_resampling import resample_tenant_model
+from tenant_scoring import MODEL_PATH, TenantScorer, fit_tenant_model, save_model
+
+
+REFERENCE_DATE = '2024-10-08'
+SUMMER_START = '2024-12-01'
+
+
+def engineer_listing_features(df, reference_date=REFERENCE_DATE, summer_start=SUMMER_START):
+    """Interaction, availability, peak-season and log-price features from the Airbnb notebook"""
+    df = df.copy()
+    df['bedrooms_bathrooms'] = df['bedrooms'] * df['bathrooms']
+    df['bedrooms_accommodates'] = df['bedrooms'] * df['accommodates']
+    df['bathrooms_accommodates'] = df['bathrooms'] * df['accommodates']
+    df['is_superhost'] = df['host_is_superhost'].astype('Int64')
+    df['review_scores_rating'] = pd.to_numeric(df['review_scores_rating'], errors='coerce')
+    df['is_high_rated'] = (df['review_scores_rating'] >= 4.5).astype(int)
+
+    df['combined_availability'] = (
+        (df['availability_30'] / 30 * 0.4) +
+        (df['availability_60'] / 60 * 0.3) +
+        (df['availability_90'] / 90 * 0.2) +
+        (df['availability_365'] / 365 * 0.1)
+    )
+    days_until_summer = (pd.Timestamp(summer_start) - pd.Timestamp(reference_date)).days
+    df['is_peak_season (summer)'] = (
+        (df['availability_60'] >= days_until_summer) |
+        (df['availability_90'] >= days_until_summer + 30) |
+        (df['availability_365'] >= days_until_summer + 90)
+    ).astype(int)
+
+    df['log_price'] = np.log1p(df['price'])
+    last_review = pd.to_datetime(df['last_review'], errors='coerce')
+    df['days_since_last_review'] = (pd.Timestamp(reference_date) - last_review).dt.days
+    return df
+
+
+def clean_listings(df, reference_date=REFERENCE_DATE):
+    """Ordinal encodings, host age and grouped log-price outlier removal"""
+    pipeline = default_listings_pipeline(reference_date=reference_date)
+    cleaned = pipeline.fit_transform(df.dropna(subset=['log_price']))
+    return cleaned, pipeline.report()
+
+
+def optimise_revenue(df):
+    return RevenueOptimiser(df, use_cache=False).optimise()
+
+
+def airbnb_stages(path='listings.xlsx'):
+    return [
+        Stage('listings', read_listings, params={'path': path}, files=[path]),
+        Stage('spatial_features', add_spatial_features, inputs=['listings']),
+        Stage('listing_features', engineer_listing_features, inputs=['spatial_features']),
+        Stage('listings_clean', clean_listings, inputs=['listing_features'],
+              outputs=['listings_clean', 'cleaning_report']),
+        Stage('revenue', optimise_revenue, inputs=['listings_clean']),
+    ]
+
+
+def load_cpi(path='CPI_train.csv'):
+    """Quarterly CPI series indexed by quarter, as in the CPI notebook"""
+    df = pd.read_csv(path)
+    df['Quarter'] = pd.to_datetime(df['Quarter'])
+    return df.set_index('Quarter')['CPI']
+
+
+def cpi_backtest(cpi, max_workers=None):
+    return comparison_table(backtest(cpi, max_workers=max_workers))
+
+
+def publish_cpi_forecast(cpi, search_table, horizon=8):
+    """Write a dashboard forecast artifact from the best searched ARIMA order"""
+    order, _ = best_order(search_table)
+    return write_cpi_forecast(cpi, order=order, horizon=horizon)
+
+
+def cpi_artifact_files(version):
+    """Files of the artifact version a cpi_forecast stage wrote"""
+    return [os.path.join(ARTIFACT_DIR, f'v{version}', 'meta.json')]
+
+
+def cpi_stages(path='CPI_train.csv', cashrate_path='cashrate_data.xlsx'):
+    return [
+        Stage('cpi', load_cpi, params={'path': path}, files=[path]),
+        Stage('cashrate', read_cashrate, params={'path': cashrate_path}, files=[cashrate_path],
+              outputs=['cash_rate_historical', 'cash_rate_outlook']),
+        Stage('cpi_decomposition', decompose, inputs=['cpi'], params={'period': 4}),
+        Stage('arima_search', search_arima, inputs=['cpi'], nested=True),
+        Stage('cpi_backtest', cpi_backtest, inputs=['cpi'], nested=True),
+        Stage('cpi_forecast', publish_cpi_forecast, inputs=['cpi', 'arima_search'],
+              artifacts=cpi_artifact_files),
+    ]
+
+
+def load_reviews(path='shitrentals.csv'):
+    data = pd.read_csv(path)
+    data['agency_name'] = data['agency_name'].fillna('No agency involved')
+    return data
+
+
+def fit_and_save_tenant_model(data):
+    model = fit_tenant_model(data)
+    save_model(model)
+    return model
+
+
+def score_reviews(data, model):
+    return TenantScorer(model).score_frame(data)
+
+
+def tenant_stages(path='shitrentals.csv'):
+    return [
+        Stage('reviews', load_reviews, params={'path': path}, files=[path]),
+        Stage('tenant_model', fit_and_save_tenant_model, inputs=['reviews'], artifacts=[MODEL_PATH]),
+        Stage('tenant_resampling', resample_tenant_model, inputs=['reviews'], nested=True),
+        Stage('tenant_scores', score_reviews, inputs=['reviews', 'tenant_model']),
+    ]
+
+
+NOTEBOOK_STAGES = {
+    'airbnb': airbnb_stages,
+    'cpi': cpi_stages,
+    'tenant': tenant_stages,
+}
+
+
+def run_notebook(name, targets=None, max_workers=None, **paths):
+    """Run one notebook's stages and return (outputs, timing report)"""
+    pipeline = Pipeline(NOTEBOOK_STAGES[name](**paths))
+    outputs = pipeline.run(targets=targets, max_workers=max_workers)
+    return outputs, pipeline.report()
@@ -0,0 +1,331 @@
+"""Content-hash-cached DAG runner for the notebooks' processing stages
+
+A `Stage` names a function, the outputs it reads, the outputs it produces,
+keyword parameters and any data files it depends on. `Pipeline` orders the
+stages, fingerprints each one from its function source, parameters, file
+contents and the fingerprints of the stages it reads from, and pickles
+every output under .cache/pipeline keyed by that fingerprint. A run only
+executes stages whose fingerprint has no cached outputs; the rest are
+skipped without loading anything. Ready stages run in parallel on a
+process pool, reading inputs from and writing outputs to the cache, so
+large frames never travel through the pool.
+
+The code part of a fingerprint covers the stage function's source and,
+transitively, the source of every project function and class its code
+references by name, plus the values of the project constants it reads
+(including those used as argument defaults). Editing a helper such as
+`coerce_listings` reruns the stages built on it, while an edit to an
+unrelated module leaves them cached. Calls through attributes of a
+project module object hash that whole module. `version` remains as a
+manual override. Stages that write files besides their outputs (a saved
+model, a forecast artifact) list them as `artifacts` and rerun when one is
+missing.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from data_cache import cache_path, file_hash
+
+
+_CONSTANT_TYPES = (str, bytes, int, float, complex, bool, type(None), tuple, list, dict, set, frozenset)
+
+
+def _is_constant_name(name):
+    """UPPER_CASE public globals; private module state such as worker caches is skipped"""
+    return name.isupper() and not name.startswith('_')
+
+
+def _code_objects(code):
+    """A code object and every code object nested in it (lambdas, comprehensions)"""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _code_objects(const)
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        code = getattr(obj, '__code__', None)
+        return obj.__qualname__ if code is None else code.co_code.hex() + repr(code.co_consts)
+
+
+def code_dependencies(func):
+    """{qualified name: source or repr} of what a function's code depends on
+
+    Follows the global names each function's code references, and its
+    argument defaults, into functions, classes (every method), UPPER_CASE
+    constants and module objects defined under the directory of `func`'s
+    module.
+    Installed packages are never followed.
+    """
+    module = sys.modules.get(func.__module__)
+    module_file = getattr(module, '__file__', None)
+    root = os.path.dirname(os.path.abspath(module_file)) if module_file else os.getcwd()
+
+    def in_project(obj):
+        path = getattr(sys.modules.get(getattr(obj, '__module__', None) or ''), '__file__', None)
+        return path is not None and os.path.abspath(path).startswith(root + os.sep)
+
+    found, pending = {}, [func]
+    while pending:
+        current = pending.pop()
+        key = f'{current.__module__}.{current.__qualname__}'
+        if key in found:
+            continue
+        found[key] = _source(current)
+        if inspect.isclass(current):
+            for member in vars(current).values():
+                member = getattr(member, '__func__', member)          # staticmethod / classmethod
+                for accessor in (getattr(member, 'fget', None), member):  # property
+                    if inspect.isfunction(accessor):
+                        pending.append(accessor)
+            continue
+
+        names = {name for code in _code_objects(current.__code__) for name in code.co_names}
+        values = [(name, current.__globals__[name]) for name in sorted(names) if name in current.__globals__]
+        values += [(f'default {i}', value) for i, value in enumerate(current.__defaults__ or ())]
+        values += [(f'default {name}', value) for name, value in (current.__kwdefaults__ or {}).items()]
+        for name, value in values:
+            if inspect.ismodule(value):
+                path = getattr(value, '__file__', None)
+                if path and os.path.abspath(path).startswith(root + os.sep):
+                    found[value.__name__] = file_hash(path)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                if in_project(value):
+                    pending.append(value)
+            elif isinstance(value, _CONSTANT_TYPES) and (name.startswith('default ') or _is_constant_name(name)):
+                found[f'{key}:{name}'] = repr(value)
+    return found
+
+
+class Stage:
+    """One step of a pipeline: outputs = func(*inputs, **params)
+
+    `artifacts` are files or directories the function writes as a side
+    effect, or a function of the stage's outputs returning them (for paths
+    that depend on what the stage wrote, such as a new artifact version);
+    the stage reruns when any of them is missing. A `nested` stage
+    runs its own process pool: it must accept `max_workers`, which the
+    pipeline sets (outside the fingerprint) to its share of the workers.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None, params=None, files=(), version=0,
+                 artifacts=(), nested=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs or [name])
+        self.params = dict(params or {})
+        self.files = list(files)
+        self.version = version
+        self.artifacts = artifacts if callable(artifacts) else list(artifacts)
+        self.nested = nested
+
+    def code(self):
+        return _source(self.func)
+
+    def dependencies(self):
+        """Project code and constants that are part of the stage's fingerprint"""
+        return code_dependencies(self.func)
+
+    def __repr__(self):
+        return f'Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})'
+
+
+def _load(path):
+    with open(path, 'rb') as fh:
+        return pickle.load(fh)
+
+
+def _dump(value, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _execute(func, input_paths, params, output_paths):
+    """Load inputs, run the stage and cache its outputs; runs inside a worker"""
+    inputs = [_load(path) for path in input_paths]
+    start = time.perf_counter()
+    result = func(*inputs, **params)
+    seconds = time.perf_counter() - start
+
+    results = (result,) if len(output_paths) == 1 else tuple(result)
+    if len(results) != len(output_paths):
+        raise ValueError(f'{func.__name__} returned {len(results)} values for {len(output_paths)} outputs')
+    for value, path in zip(results, output_paths):
+        _dump(value, path)
+    return seconds
+
+
+class Pipeline:
+    """A DAG of stages with cached, parallel execution
+
+    After `run()`, `report()` returns each stage's status ('ran' or
+    'cached'), wall-clock seconds and fingerprint.
+    """
+
+    def __init__(self, stages):
+        self.stages = {}
+        self.producers = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name '{stage.name}'")
+            self.stages[stage.name] = stage
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Output '{output}' is produced by both "
+                                     f"'{self.producers[output].name}' and '{stage.name}'")
+                self.producers[output] = stage
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.producers]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' reads unknown outputs {missing}")
+        self.order = self._topological_order()
+        self.timings_ = []
+
+    def upstream(self, stage):
+        """Names of the stages that produce a stage's inputs"""
+        return list(dict.fromkeys(self.producers[name].name for name in stage.inputs))
+
+    def _topological_order(self):
+        remaining = {name: set(self.upstream(stage)) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f'Stages form a cycle: {sorted(remaining)}')
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def fingerprints(self, names=None):
+        """Fingerprints computed without running anything
+
+        `names` must include every upstream stage of the stages it lists;
+        the default is the whole pipeline.
+        """
+        fingerprints = {}
+        for name in names or self.order:
+            stage = self.stages[name]
+            payload = {
+                'name': name,
+                'code': stage.code(),
+                'dependencies': stage.dependencies(),
+                'version': stage.version,
+                'params': json.dumps(stage.params, sort_keys=True, default=repr),
+                'inputs': [(item, fingerprints[self.producers[item].name]) for item in stage.inputs],
+                'files': [(path, file_hash(path)) for path in stage.files],
+            }
+            fingerprints[name] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:20]
+        return fingerprints
+
+    def _output_path(self, output, fingerprints):
+        stage = self.producers[output]
+        return cache_path('pipeline', stage.name, f'{fingerprints[stage.name]}-{output}.pkl')
+
+    def _needed(self, targets):
+        """Stages required for the targets (stage or output names), in run order"""
+        if targets is None:
+            return list(self.order)
+        pending = [self.stages[t].name if t in self.stages else self.producers[t].name for t in targets]
+        needed = set()
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.upstream(self.stages[name]))
+        return [name for name in self.order if name in needed]
+
+    def run(self, targets=None, max_workers=None, force=()):
+        """Run what is stale and return the targets' outputs
+
+        `targets` are stage or output names (default: every stage, returning
+        the outputs no other stage reads); `force` names stages to rerun even
+        when cached. With `max_workers=1` stages run in this process.
+        Returns {output name: value} for the targets.
+        """
+        needed = self._needed(targets)
+        fingerprints = self.fingerprints(needed)
+        paths = {output: self._output_path(output, fingerprints)
+                 for name in needed for output in self.stages[name].outputs}
+
+        self.timings_ = []
+        stale = []
+        for name in needed:
+            stage = self.stages[name]
+            if (name in force or not all(os.path.exists(paths[output]) for output in stage.outputs)
+                    or not self._artifacts_present(stage, paths)):
+                stale.append(name)
+            else:
+                self._record(name, 'cached', 0.0, fingerprints)
+
+        # Nested pools split the worker budget instead of each taking every core
+        workers = max_workers or os.cpu_count() or 1
+        n_nested = sum(self.stages[name].nested for name in stale)
+        nested_workers = max(1, workers // n_nested) if n_nested else workers
+
+        def job(name):
+            stage = self.stages[name]
+            params = {**stage.params, 'max_workers': nested_workers} if stage.nested else stage.params
+            return (stage.func, [paths[item] for item in stage.inputs], params,
+                    [paths[output] for output in stage.outputs])
+
+        if max_workers == 1:
+            for name in stale:
+                self._record(name, 'ran', _execute(*job(name)), fingerprints)
+        elif stale:
+            stale_set = set(stale)
+            done = set(needed) - stale_set
+            running = {}
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                while stale_set or running:
+                    for name in [n for n in stale if n in stale_set]:
+                        if all(up in done for up in self.upstream(self.stages[name])):
+                            running[pool.submit(_execute, *job(name))] = name
+                            stale_set.discard(name)
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        self._record(name, 'ran', future.result(), fingerprints)
+                        done.add(name)
+
+        if targets is None:
+            # Only the pipeline's end products, outputs no stage reads, are loaded back
+            consumed = {item for stage in self.stages.values() for item in stage.inputs}
+            outputs = [output for name in needed for output in self.stages[name].outputs if output not in consumed]
+        else:
+            outputs = [output for t in targets for output in (self.stages[t].outputs if t in self.stages else [t])]
+        return {output: _load(paths[output]) for output in outputs}
+
+    @staticmethod
+    def _artifacts_present(stage, paths):
+        artifacts = stage.artifacts
+        if callable(artifacts):
+            artifacts = artifacts(*[_load(paths[output]) for output in stage.outputs])
+        return all(os.path.exists(path) for path in artifacts)
+
+    def _record(self, name, status, seconds, fingerprints):
+        self.timings_.append({'stage': name, 'status': status, 'seconds': seconds,
+                              'fingerprint': fingerprints[name]})
+
+    def report(self):
+        report = pd.DataFrame(self.timings_, columns=['stage', 'status', 'seconds', 'fingerprint'])
+        position = {name: i for i, name in enumerate(self.order)}
+        return report.sort_values('stage', key=lambda s: s.map(position)).reset_index(drop=True)
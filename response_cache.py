@@ -0,0 +1,187 @@
+"""HTTP response caching and compression for the dashboard's Flask server
+
+`install_response_cache(app.server, dataset_version)` adds a
+before_request/after_request pair that:
+
+- derives an ETag for Dash's JSON endpoints from the request body (the
+  callback's inputs and state) and the dataset version, and answers a
+  matching If-None-Match with 304 Not Modified
+- serves repeated callback requests from a SQLite response cache shared by
+  every worker process on the host, with a TTL and least-recently-used
+  eviction once the stored bodies exceed `max_bytes`
+- compresses compressible responses with brotli when the client accepts it
+  and the `brotli` package is installed, otherwise gzip
+
+Cached bodies are stored already compressed, so a hit costs one SQLite read.
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+
+from flask import Response, g, request
+
+
+# Same shared cache directory as data_cache, without importing its pyarrow stack
+DEFAULT_PATH = os.path.join('.cache', 'http', 'responses.sqlite')
+CACHEABLE_PATHS = ('/_dash-update-component', '/_dash-layout', '/_dash-dependencies')
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/')
+
+
+def _available_encodings():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return ['gzip']
+    return ['br', 'gzip']
+
+
+def compress(body, encoding, level=6):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+class ResponseCache:
+    """SQLite table of compressed responses keyed by ETag"""
+
+    def __init__(self, path=None, ttl=3600, max_bytes=256 * 1024 * 1024):
+        self.path = path or DEFAULT_PATH
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            # WAL lets the worker processes read while one of them writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' etag TEXT PRIMARY KEY, status INTEGER, content_type TEXT,'
+                ' encoding TEXT, body BLOB, size INTEGER, created REAL, accessed REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, etag):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT status, content_type, encoding, body FROM responses'
+                ' WHERE etag = ? AND created >= ?',
+                (etag, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE responses SET accessed = ? WHERE etag = ?', (now, etag))
+        if row is None:
+            return None
+        return {'status': row[0], 'content_type': row[1], 'encoding': row[2], 'body': row[3]}
+
+    def put(self, etag, status, content_type, encoding, body):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (etag, status, content_type, encoding, sqlite3.Binary(body), len(body), now, now),
+            )
+            conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the stored bodies fit in max_bytes"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, doomed = total - self.max_bytes, []
+        for etag, size in conn.execute('SELECT etag, size FROM responses ORDER BY accessed'):
+            doomed.append((etag,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM responses WHERE etag = ?', doomed)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
+
+
+def _is_compressible(response, min_size):
+    return (response.status_code == 200
+            and 'Content-Encoding' not in response.headers
+            and (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+            and (response.content_length is None or response.content_length >= min_size))
+
+
+def install_response_cache(server, dataset_version, cache=None, paths=CACHEABLE_PATHS,
+                           min_size=500, compresslevel=6):
+    """Attach ETag, response caching and compression hooks to a Flask server
+
+    `dataset_version` should change whenever the data behind the callbacks
+    does (e.g. a hash of the input CSV); it is part of every ETag and cache
+    key, so a new dataset never serves stale figures. Returns the cache.
+    """
+    cache = cache or ResponseCache()
+    encodings = _available_encodings()
+
+    def negotiate():
+        return request.accept_encodings.best_match(encodings) or 'identity'
+
+    @server.before_request
+    def serve_cached():
+        if request.path not in paths:
+            return None
+        digest = hashlib.sha256(f'{dataset_version}\0{request.method}\0{request.full_path}\0'.encode())
+        digest.update(request.get_data(cache=True))
+        encoding = negotiate()
+        # The encoding is part of the tag: gzip and brotli bodies differ byte for byte
+        etag = f'{digest.hexdigest()[:32]}-{encoding}'
+        g.response_cache = {'etag': etag, 'encoding': encoding, 'hit': False}
+
+        if request.if_none_match.contains(etag):
+            g.response_cache['hit'] = True
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        stored = cache.get(etag)
+        if stored is None:
+            return None
+        g.response_cache['hit'] = True
+        response = Response(stored['body'], status=stored['status'], content_type=stored['content_type'])
+        if stored['encoding'] != 'identity':
+            response.headers['Content-Encoding'] = stored['encoding']
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @server.after_request
+    def compress_and_store(response):
+        state = g.get('response_cache')
+        if state is not None and state['hit']:
+            return response
+        if not _is_compressible(response, min_size):
+            return response
+
+        # Static bundles are sent as file streams; read them so they can be compressed
+        response.direct_passthrough = False
+        body = response.get_data()
+        encoding = state['encoding'] if state is not None else negotiate()
+        if encoding != 'identity' and len(body) >= min_size:
+            body = compress(body, encoding, compresslevel)
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            encoding = 'identity'
+        response.vary.add('Accept-Encoding')
+
+        if state is not None:
+            response.set_etag(state['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            cache.put(state['etag'], response.status_code, response.content_type, encoding, body)
+        return response
+
+    return cache
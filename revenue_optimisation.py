@@ -0,0 +1,201 @@
+"""Batch revenue optimisation over the Airbnb price model
+
+An occupancy model is fitted on the notebook's engineered features plus
+`log_price`, with occupancy taken as 1 - `combined_availability`. For every
+listing the model is evaluated over a grid of candidate nightly prices and
+demand scenarios in one broadcasted matrix operation, and the
+revenue-maximising price is returned.
+
+The notebook's 'is_peak_season (summer)' flag is left out of the model: it
+is computed from availability_60/90/365, so it measures open calendar days
+rather than season and a fit against occupancy (1 - availability) gives it
+a mechanically negative coefficient. Scenarios are instead explicit shifts
+of expected occupancy, optionally combined with feature overrides. The fitted model and the feature
+matrix are cached on disk, so re-optimising a city after changing the grid
+or scenarios skips both the feature build and the fit.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from data_cache import cache_path
+
+
+REVENUE_FEATURES = [
+    'accommodates', 'bedrooms', 'bathrooms', 'beds',
+    'review_scores_rating', 'number_of_reviews', 'distance_to_city_center (in km)',
+    'property_type_ordinal', 'room_type_ordinal', 'host_is_superhost',
+    'minimum_nights',
+]
+
+DEFAULT_MULTIPLIERS = np.linspace(0.5, 2.0, 31)
+
+# Scenario key for an additive shift of expected occupancy (a demand change);
+# every other key overrides a model feature
+OCCUPANCY_SHIFT = 'occupancy_shift'
+
+DEFAULT_SCENARIOS = {
+    'low_demand': {OCCUPANCY_SHIFT: -0.1},
+    'current': {},
+    'high_demand': {OCCUPANCY_SHIFT: 0.1},
+}
+
+
+def frame_hash(df, columns):
+    """Stable content hash of selected DataFrame columns"""
+    digest = hashlib.sha256(json.dumps(list(columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def build_feature_matrix(df, features=REVENUE_FEATURES):
+    """Numeric float64 feature matrix with missing values filled by 0, as in the notebook"""
+    X = df[features].apply(pd.to_numeric, errors='coerce').astype('float64')
+    return np.ascontiguousarray(X.fillna(0).to_numpy())
+
+
+def fit_occupancy_model(X, price, occupancy, features=REVENUE_FEATURES):
+    """Least-squares occupancy model on [features, log_price]
+
+    Returns the model artifacts as a plain dict of arrays so they can be
+    saved with np.savez.
+    """
+    log_price = np.log1p(np.asarray(price, dtype=np.float64))
+    occupancy = np.asarray(occupancy, dtype=np.float64)
+    keep = np.isfinite(log_price) & np.isfinite(occupancy)
+
+    design = np.column_stack([np.ones(keep.sum()), X[keep], log_price[keep]])
+    beta, *_ = np.linalg.lstsq(design, occupancy[keep], rcond=None)
+
+    if beta[-1] >= 0:
+        warnings.warn('Fitted occupancy does not fall with price; optimal prices will sit at the top of the grid')
+
+    return {
+        'features': np.array(features),
+        'intercept': beta[0],
+        'coef': beta[1:-1],
+        'price_coef': beta[-1],
+    }
+
+
+def _scenario_offsets(X, model, scenarios):
+    """(n_listings, n_scenarios) shift in linear predictor for each scenario's overrides"""
+    features = list(model['features'])
+    offsets = np.zeros((X.shape[0], len(scenarios)))
+    for s, overrides in enumerate(scenarios.values()):
+        for column, value in overrides.items():
+            if column == OCCUPANCY_SHIFT:
+                offsets[:, s] += value
+                continue
+            j = features.index(column)
+            offsets[:, s] += (value - X[:, j]) * model['coef'][j]
+    return offsets
+
+
+def optimise_prices(X, price, model, multipliers=DEFAULT_MULTIPLIERS, scenarios=None,
+                    nights=30, chunk_size=50_000):
+    """Revenue-maximising price per listing and scenario
+
+    Candidate prices are `price * multipliers`. Rows are processed in chunks
+    so the (rows, scenarios, candidates) working array stays bounded.
+    Returns a long DataFrame with one row per (listing, scenario).
+    `at_grid_edge` marks optima at the lowest or highest multiplier, where
+    the true optimum may lie outside the grid; a warning gives the share of
+    listings affected.
+    """
+    scenarios = DEFAULT_SCENARIOS if scenarios is None else scenarios
+    if not scenarios:
+        scenarios = {'current': {}}
+    price = np.asarray(price, dtype=np.float64)
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    n, n_scenarios = len(price), len(scenarios)
+
+    best_price = np.empty((n, n_scenarios))
+    best_occupancy = np.empty((n, n_scenarios))
+    best_revenue = np.empty((n, n_scenarios))
+    at_edge = np.empty((n, n_scenarios), dtype=bool)
+    edges = [np.argmin(multipliers), np.argmax(multipliers)]
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        X_chunk = X[start:stop]
+        base = model['intercept'] + X_chunk @ model['coef']
+        linear = base[:, None] + _scenario_offsets(X_chunk, model, scenarios)        # (rows, S)
+
+        candidates = price[start:stop, None] * multipliers[None, :]                  # (rows, G)
+        occupancy = np.clip(
+            linear[:, :, None] + model['price_coef'] * np.log1p(candidates)[:, None, :], 0, 1
+        )                                                                            # (rows, S, G)
+        revenue = candidates[:, None, :] * occupancy * nights
+
+        best = np.argmax(np.nan_to_num(revenue, nan=-np.inf), axis=2)
+        rows = np.arange(stop - start)[:, None]
+        cols = np.arange(n_scenarios)[None, :]
+        best_price[start:stop] = candidates[rows, best]
+        best_occupancy[start:stop] = occupancy[rows, cols, best]
+        best_revenue[start:stop] = revenue[rows, cols, best]
+        at_edge[start:stop] = np.isin(best, edges)
+
+    # Listings without a usable price have no optimum to flag
+    at_edge &= np.isfinite(best_revenue)
+    share = at_edge.any(axis=1).mean() if n else 0.0
+    if share:
+        warnings.warn(f'{share:.1%} of listings have an optimal price at the edge of the '
+                      f'multiplier grid ({multipliers.min():g}x-{multipliers.max():g}x); widen it')
+
+    return pd.DataFrame({
+        'listing': np.repeat(np.arange(n), n_scenarios),
+        'scenario': np.tile(list(scenarios), n),
+        'current_price': np.repeat(price, n_scenarios),
+        'optimal_price': best_price.ravel(),
+        'expected_occupancy': best_occupancy.ravel(),
+        'expected_revenue': best_revenue.ravel(),
+        'at_grid_edge': at_edge.ravel(),
+    })
+
+
+class RevenueOptimiser:
+    """Cached fit + batched optimisation for a whole city's listings
+
+    The feature matrix is stored as a .npy file and reopened memory-mapped;
+    the model is stored as .npz. Both are keyed by a hash of the input
+    columns, so only a change to the listings triggers a rebuild.
+    """
+
+    def __init__(self, df, features=REVENUE_FEATURES, price_col='price',
+                 availability_col='combined_availability', use_cache=True):
+        self.features = list(features)
+        self.price = pd.to_numeric(df[price_col], errors='coerce').to_numpy(dtype=np.float64)
+        self.index = df.index
+
+        key = frame_hash(df, self.features + [price_col, availability_col])
+        matrix_path = cache_path('revenue', f'features-{key}.npy')
+        model_path = cache_path('revenue', f'model-{key}.npz')
+
+        if use_cache and os.path.exists(matrix_path):
+            self.X = np.load(matrix_path, mmap_mode='r')
+        else:
+            self.X = build_feature_matrix(df, self.features)
+            if use_cache:
+                np.save(matrix_path, self.X)
+
+        if use_cache and os.path.exists(model_path):
+            with np.load(model_path) as stored:
+                self.model = {name: stored[name] for name in stored.files}
+        else:
+            occupancy = 1 - pd.to_numeric(df[availability_col], errors='coerce').to_numpy(dtype=np.float64)
+            self.model = fit_occupancy_model(self.X, self.price, occupancy, self.features)
+            if use_cache:
+                np.savez(model_path, **self.model)
+
+    def optimise(self, multipliers=DEFAULT_MULTIPLIERS, scenarios=None, nights=30, chunk_size=50_000):
+        """Optimise every listing; `listing` in the result is the original index label"""
+        result = optimise_prices(self.X, self.price, self.model, multipliers=multipliers,
+                                 scenarios=scenarios, nights=nights, chunk_size=chunk_size)
+        result['listing'] = self.index.to_numpy()[result['listing'].to_numpy()]
+        return result
@@ -0,0 +1,167 @@
+"""Incremental additive seasonal decomposition for CPI series
+
+Generalises the notebook's hard-wired decomposition (CMA-4 trend, reshape
+to (33, 4), column means, np.tile) to any length and period, and to many
+series at once. The decomposer keeps running per-season sums of the
+detrended values, so appending one observation per series finalises one
+more centred-trend point and updates the seasonal indices in O(period).
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def centred_ma_weights(period):
+    """Weights of the centred moving average used for the trend
+
+    Even periods use the 2 x period MA (the notebook's
+    rolling(4).mean().rolling(2).mean() for quarterly data); odd periods
+    use a plain period-length MA.
+    """
+    if period % 2 == 0:
+        weights = np.ones(period + 1)
+        weights[0] = weights[-1] = 0.5
+    else:
+        weights = np.ones(period)
+    return weights / period
+
+
+class SeasonalDecomposer:
+    """Streaming additive decomposition of one or many aligned series
+
+    Values are laid out as (n_series, n_obs). Season positions are counted
+    from the first observation, as in the notebook's reshape. Seasonal
+    indices average every detrended value available for that season and
+    are normalised to sum to zero.
+    """
+
+    def __init__(self, period=4, n_series=1):
+        self.period = period
+        self.n_series = n_series
+        self.weights = centred_ma_weights(period)
+        self.half = len(self.weights) // 2
+
+        self.n_obs = 0
+        self._values = np.empty((n_series, 0))
+        self._trend = np.empty((n_series, 0))
+        self.season_sum = np.zeros((n_series, period))
+        self.season_count = np.zeros(period, dtype=np.int64)
+
+    def _reserve(self, n_obs):
+        """Grow the value and trend buffers geometrically"""
+        capacity = self._values.shape[1]
+        if n_obs <= capacity:
+            return
+        new_capacity = max(n_obs, 2 * capacity, 16)
+        values = np.full((self.n_series, new_capacity), np.nan)
+        trend = np.full((self.n_series, new_capacity), np.nan)
+        values[:, :self.n_obs] = self._values[:, :self.n_obs]
+        trend[:, :self.n_obs] = self._trend[:, :self.n_obs]
+        self._values, self._trend = values, trend
+
+    @staticmethod
+    def _as_2d(values):
+        values = np.asarray(values, dtype=np.float64)
+        return values.reshape(1, -1) if values.ndim == 1 else values
+
+    def fit(self, values):
+        """Decompose a full history in one vectorized pass"""
+        values = self._as_2d(values)
+        if values.shape[0] != self.n_series:
+            raise ValueError(f'Expected {self.n_series} series, got {values.shape[0]}')
+
+        self.n_obs = 0
+        self._values = np.empty((self.n_series, 0))
+        self._trend = np.empty((self.n_series, 0))
+        self._reserve(values.shape[1])
+        self._values[:, :values.shape[1]] = values
+        self.n_obs = values.shape[1]
+
+        self.season_sum[:] = 0
+        self.season_count[:] = 0
+        width = len(self.weights)
+        if self.n_obs >= width:
+            windows = np.lib.stride_tricks.sliding_window_view(values, width, axis=1)
+            trend = windows @ self.weights
+            positions = np.arange(self.half, self.n_obs - self.half)
+            self._trend[:, positions] = trend
+
+            detrended = values[:, positions] - trend
+            seasons = positions % self.period
+            for season in range(self.period):
+                hit = seasons == season
+                self.season_sum[:, season] = detrended[:, hit].sum(axis=1)
+                self.season_count[season] = hit.sum()
+        return self
+
+    def update(self, new_values):
+        """Append one observation per series
+
+        Finalises the centred trend at n_obs - 1 - half and folds its
+        detrended value into that season's running sum. Returns the current
+        (n_series, period) seasonal indices.
+        """
+        new_values = np.asarray(new_values, dtype=np.float64).reshape(self.n_series)
+        self._reserve(self.n_obs + 1)
+        self._values[:, self.n_obs] = new_values
+        self.n_obs += 1
+
+        width = len(self.weights)
+        if self.n_obs >= width:
+            position = self.n_obs - 1 - self.half
+            window = self._values[:, self.n_obs - width:self.n_obs]
+            trend = window @ self.weights
+            self._trend[:, position] = trend
+
+            season = position % self.period
+            self.season_sum[:, season] += self._values[:, position] - trend
+            self.season_count[season] += 1
+        return self.seasonal_indices
+
+    @property
+    def seasonal_indices(self):
+        """(n_series, period) normalised additive seasonal indices"""
+        # Seasons with no finalised trend point yet stay NaN
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            averages = self.season_sum / self.season_count
+            return averages - np.nanmean(averages, axis=1, keepdims=True)
+
+    @property
+    def values(self):
+        return self._values[:, :self.n_obs]
+
+    @property
+    def trend(self):
+        """Centred trend; the first and last `half` points are NaN"""
+        return self._trend[:, :self.n_obs]
+
+    @property
+    def seasonal(self):
+        """Seasonal component tiled over the full history"""
+        return self.seasonal_indices[:, np.arange(self.n_obs) % self.period]
+
+    @property
+    def seasonally_adjusted(self):
+        return self.values - self.seasonal
+
+
+def decompose(ts, period=4):
+    """Decompose a pandas Series (or the columns of a DataFrame)
+
+    Returns a DataFrame with 'trend', 'seasonal' and 'seasonally_adjusted'
+    columns for a Series, or a dict of DataFrames keyed by column name.
+    """
+    frame = ts.to_frame() if isinstance(ts, pd.Series) else ts
+    decomposer = SeasonalDecomposer(period=period, n_series=frame.shape[1]).fit(frame.to_numpy().T)
+
+    parts = {}
+    for i, name in enumerate(frame.columns):
+        parts[name] = pd.DataFrame({
+            'trend': decomposer.trend[i],
+            'seasonal': decomposer.seasonal[i],
+            'seasonally_adjusted': decomposer.seasonally_adjusted[i],
+        }, index=frame.index)
+    return parts[frame.columns[0]] if isinstance(ts, pd.Series) else parts
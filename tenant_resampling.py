@@ -0,0 +1,236 @@
+"""Parallel bootstrap and cross-validation for the ordinal tenant-score model
+
+The notebook reports one `OrderedModel` fit. Here the design matrix (the
+structured features of the notebook's Model 3, plus the TF-IDF columns of
+any words opted in to) is built once, saved as .npy and memory-mapped
+read-only by every worker, so no feature is ever recomputed. Bootstrap
+replicates and cross-validation folds are expressed as observation weights
+(multinomial counts, or 0/1 for held-out rows) rather than copied data, and
+each refit is an L-BFGS run on the ordinal-logit likelihood with an
+analytic gradient, warm-started from the full-data estimate. Parameters use
+statsmodels' layout: coefficients, the first cutpoint, then log increments
+between cutpoints.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import expit
+
+from data_cache import cache_path
+from tenant_scoring import TENANT_FEATURES, TENANT_WORDS, structured_features
+
+
+def build_design(data, features=TENANT_FEATURES, words=TENANT_WORDS,
+                 text_column='review_text', target='score'):
+    """Design matrix, 0-based level codes, column names and level labels"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    X = structured_features(data, features)
+    if len(words):
+        texts = data[text_column].fillna('').astype(str).to_numpy()
+        vectorizer = TfidfVectorizer().fit(texts)
+        missing = [word for word in words if word not in vectorizer.vocabulary_]
+        if missing:
+            raise ValueError(f'Words not in the review vocabulary: {missing}')
+        tfidf = vectorizer.transform(texts)
+        word_index = [vectorizer.vocabulary_[word] for word in words]
+        X = np.hstack([X, tfidf[:, word_index].toarray()])
+    codes, levels = pd.factorize(data[target], sort=True)
+    if (codes < 0).any():
+        raise ValueError(f"'{target}' has missing values")
+    return np.ascontiguousarray(X), codes, list(features) + list(words), np.asarray(levels)
+
+
+def thresholds_from_params(params, n_exog):
+    """Cutpoints from the first-cutpoint + log-increment parametrisation"""
+    raw = params[n_exog:]
+    return np.concatenate([raw[:1], raw[0] + np.cumsum(np.exp(raw[1:]))])
+
+
+def ordinal_proba(X, params, n_levels):
+    """(n_rows, n_levels) probabilities, P(y <= k) = logistic(cut_k - x'b)"""
+    n_exog = X.shape[1]
+    eta = X @ params[:n_exog]
+    cumulative = expit(thresholds_from_params(params, n_exog)[None, :] - eta[:, None])
+    ones = np.ones((len(eta), 1))
+    return np.diff(np.hstack([0 * ones, cumulative, ones]), axis=1)
+
+
+def _negative_loglik(params, X, y, weights, n_levels):
+    """Weighted negative log-likelihood and its gradient"""
+    n_exog = X.shape[1]
+    cuts = np.concatenate([[-np.inf], thresholds_from_params(params, n_exog), [np.inf]])
+    eta = X @ params[:n_exog]
+
+    upper = expit(cuts[y + 1] - eta)
+    lower = expit(cuts[y] - eta)
+    prob = np.maximum(upper - lower, 1e-300)
+    density_upper = upper * (1 - upper)
+    density_lower = lower * (1 - lower)
+
+    value = -np.sum(weights * np.log(prob))
+
+    scaled = weights / prob
+    grad_eta = scaled * (density_upper - density_lower)                 # d(-ll)/d(eta)
+    grad_beta = X.T @ grad_eta
+    # d(-ll)/d(cut_k): cut_k is the upper bound of level k and the lower bound of level k+1
+    grad_cuts = (np.bincount(y + 1, weights=-scaled * density_upper, minlength=n_levels + 1)
+                 + np.bincount(y, weights=scaled * density_lower, minlength=n_levels + 1))[1:n_levels]
+    raw = params[n_exog:]
+    grad_raw = np.empty_like(raw)
+    grad_raw[0] = grad_cuts.sum()
+    # cut_j depends on every increment m < j
+    grad_raw[1:] = np.exp(raw[1:]) * np.cumsum(grad_cuts[::-1])[::-1][1:]
+    return value, np.concatenate([grad_beta, grad_raw])
+
+
+def fit_ordinal(X, y, n_levels, weights=None, start=None, maxiter=1000):
+    """Maximum-likelihood ordinal logit; returns (params, converged)
+
+    Columns are centred and scaled for the optimiser (weekly_price is in
+    the hundreds while TF-IDF weights are below one) and the estimate is
+    mapped back to the original scale.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    weights = np.ones(len(y)) if weights is None else np.asarray(weights, dtype=np.float64)
+    n_exog = X.shape[1]
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (X - mean) / scale
+
+    if start is None:
+        # Cutpoints at the logits of the cumulative level shares
+        shares = np.clip(np.cumsum(np.bincount(y, weights=weights, minlength=n_levels))[:-1] / weights.sum(),
+                         1e-6, 1 - 1e-6)
+        cuts = np.log(shares / (1 - shares))
+        z_start = np.concatenate([np.zeros(n_exog), cuts[:1], np.log(np.maximum(np.diff(cuts), 1e-3))])
+    else:
+        # x'b - cut = z'(b * scale) - (cut - mean'b); increments are unchanged
+        z_start = np.array(start, dtype=np.float64)
+        z_start[n_exog] -= mean @ z_start[:n_exog]
+        z_start[:n_exog] *= scale
+
+    result = minimize(_negative_loglik, z_start, jac=True, args=(Z, y, weights, n_levels),
+                      method='L-BFGS-B', options={'maxiter': maxiter, 'gtol': 1e-8})
+
+    params = result.x.copy()
+    params[:n_exog] /= scale
+    params[n_exog] += mean @ params[:n_exog]
+    return params, bool(result.success)
+
+
+_DESIGN = {}
+
+
+def _load_design(x_path, y_path, n_levels):
+    """Worker initializer: memory-map the shared design matrix once per process"""
+    _DESIGN['X'] = np.load(x_path, mmap_mode='r')
+    _DESIGN['y'] = np.load(y_path)
+    _DESIGN['n_levels'] = n_levels
+
+
+def _bootstrap_batch(args):
+    """Refit on a batch of multinomial-weight replicates; runs in a worker"""
+    seed, n_replicates, start = args
+    X, y, n_levels = _DESIGN['X'], _DESIGN['y'], _DESIGN['n_levels']
+    rng = np.random.default_rng(seed)
+    draws = np.empty((n_replicates, len(start)))
+    converged = np.empty(n_replicates, dtype=bool)
+    for b in range(n_replicates):
+        weights = rng.multinomial(len(y), np.full(len(y), 1 / len(y))).astype(np.float64)
+        draws[b], converged[b] = fit_ordinal(X, y, n_levels, weights=weights, start=start)
+    return draws, converged
+
+
+def _fold_proba(args):
+    """Fit with one fold held out and predict it; runs in a worker"""
+    held_out, start = args
+    X, y, n_levels = _DESIGN['X'], _DESIGN['y'], _DESIGN['n_levels']
+    weights = np.ones(len(y))
+    weights[held_out] = 0
+    params, _ = fit_ordinal(X, y, n_levels, weights=weights, start=start)
+    return held_out, ordinal_proba(np.asarray(X[held_out]), params, n_levels)
+
+
+def _save_design(X, y):
+    digest = hashlib.sha256(X.tobytes())
+    digest.update(np.asarray(y, dtype=np.int64).tobytes())
+    key = digest.hexdigest()[:16]
+    x_path = cache_path('tenant', f'design-{key}-X.npy')
+    y_path = cache_path('tenant', f'design-{key}-y.npy')
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        np.save(x_path, X)
+        np.save(y_path, np.asarray(y, dtype=np.int64))
+    return x_path, y_path
+
+
+def coefficient_intervals(params, draws, names, n_exog, level=0.95):
+    """Percentile bootstrap intervals for coefficients and cutpoints"""
+    cuts = thresholds_from_params(params, n_exog)
+    draw_cuts = np.apply_along_axis(thresholds_from_params, 1, draws, n_exog)
+    estimates = np.concatenate([params[:n_exog], cuts])
+    samples = np.hstack([draws[:, :n_exog], draw_cuts])
+    labels = list(names) + [f'cutpoint_{k}' for k in range(1, len(cuts) + 1)]
+
+    alpha = (1 - level) / 2
+    return pd.DataFrame({
+        'estimate': estimates,
+        'bootstrap_se': samples.std(axis=0, ddof=1),
+        'lower': np.quantile(samples, alpha, axis=0),
+        'upper': np.quantile(samples, 1 - alpha, axis=0),
+    }, index=pd.Index(labels, name='param'))
+
+
+def calibration_by_level(y, proba, levels):
+    """Observed vs mean predicted share, Brier score and n for each score level"""
+    observed = np.eye(len(levels))[y]
+    return pd.DataFrame({
+        'n': observed.sum(axis=0).astype(int),
+        'observed_rate': observed.mean(axis=0),
+        'mean_predicted': proba.mean(axis=0),
+        'brier': ((proba - observed) ** 2).mean(axis=0),
+    }, index=pd.Index(levels, name='score'))
+
+
+def resample_tenant_model(data, n_boot=1000, n_folds=5, level=0.95, seed=0, batch_size=50,
+                          max_workers=None, features=TENANT_FEATURES, words=TENANT_WORDS):
+    """Bootstrap intervals and k-fold calibration for the tenant-score model
+
+    Returns a dict with the full-data 'params', the 'intervals' table, the
+    'calibration' table per score level, out-of-fold 'log_loss' and
+    'accuracy', and the share of bootstrap fits that 'converged'.
+    """
+    X, y, names, levels = build_design(data, features=features, words=words)
+    n_levels = len(levels)
+    params, _ = fit_ordinal(X, y, n_levels)
+
+    x_path, y_path = _save_design(X, y)
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_boot // batch_size))
+    batches = [(s, min(batch_size, n_boot - i * batch_size), params) for i, s in enumerate(seeds)]
+    folds = np.array_split(np.random.default_rng(seed).permutation(len(y)), n_folds)
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                             initializer=_load_design, initargs=(x_path, y_path, n_levels)) as pool:
+        fold_results = pool.map(_fold_proba, [(fold, params) for fold in folds])
+        boot_results = list(pool.map(_bootstrap_batch, batches))
+        oof = np.empty((len(y), n_levels))
+        for held_out, proba in fold_results:
+            oof[held_out] = proba
+
+    draws = np.vstack([d for d, _ in boot_results])
+    converged = np.concatenate([c for _, c in boot_results])
+    return {
+        # Threshold parameters are named like OrderedModel's ('1/2', '2/3', ...)
+        'params': pd.Series(params, index=list(names) + [f'{a}/{b}' for a, b in zip(levels[:-1], levels[1:])]),
+        'intervals': coefficient_intervals(params, draws, names, X.shape[1], level=level),
+        'calibration': calibration_by_level(y, oof, levels),
+        'log_loss': float(-np.mean(np.log(np.maximum(oof[np.arange(len(y)), y], 1e-300)))),
+        'accuracy': float(np.mean(oof.argmax(axis=1) == y)),
+        'converged': float(converged.mean()),
+    }
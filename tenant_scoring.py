@@ -0,0 +1,238 @@
+"""Batch and single-review scoring with the tenant-score ordinal model
+
+The tenant notebook fits several `OrderedModel` logits interactively and
+selects Model 3: weekly price plus its interaction with the two-bedroom
+dummy, with no review-text terms (the EDA found the TF-IDF words
+uncorrelated with score). `fit_tenant_model` refits that specification
+once and keeps only what scoring needs: the structured coefficients and
+the ordinal cutpoints. Text terms are opt-in (`words=WORDS_OF_INTEREST`);
+when used, the artifacts also hold the full TF-IDF vocabulary and idf
+weights (the l2 normalisation depends on every term, not just the
+modelled words) and the text coefficients as a sparse vector over that
+vocabulary. `TenantScorer` rebuilds the
+vectorizer from those arrays, and `score_csv` streams a review file in
+chunks, scoring each CSR chunk with one sparse matrix-vector product.
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from data_cache import cache_path
+
+
+MODEL_PATH = os.path.join('artifacts', 'tenant_score', 'model.npz')
+
+# Columns of the notebook's selected Model 3 (X3); dummy and interaction names
+# follow the notebook's get_dummies / interaction naming and are rebuilt from
+# raw columns
+TENANT_FEATURES = ['weekly_price', 'interaction_weekly_price_n_bedrooms']
+# Review-text terms of the selected model: none
+TENANT_WORDS = []
+# The words the notebook's text EDA examined, for opting in to text terms
+WORDS_OF_INTEREST = ['pest', 'violation', 'landlord']
+CATEGORICAL_COLUMNS = ['n_bedrooms', 'suburb']
+INTERACTION_PREFIX = 'interaction_weekly_price_'
+
+
+def _feature_column(frame, name):
+    """One feature column from a DataFrame or a dict of equal-length arrays"""
+    if name in frame:
+        return np.asarray(pd.to_numeric(frame[name], errors='coerce'), dtype=np.float64)
+    if name.startswith(INTERACTION_PREFIX):
+        other = name[len(INTERACTION_PREFIX):]
+        # The notebook names the bedroom interaction without the level
+        other = 'n_bedrooms_2' if other == 'n_bedrooms' else other
+        return _feature_column(frame, 'weekly_price') * _feature_column(frame, other)
+    for column in CATEGORICAL_COLUMNS:
+        if name.startswith(column + '_') and column in frame:
+            level = name[len(column) + 1:]
+            values = frame[column]
+            # Numeric levels (bedroom counts) compare as numbers so 2 and 2.0 match
+            if level.replace('.', '', 1).isdigit():
+                values = pd.to_numeric(values, errors='coerce')
+                return (np.asarray(values, dtype=np.float64) == float(level)).astype(np.float64)
+            return (np.asarray(values).astype(str) == level).astype(np.float64)
+    raise KeyError(f"Cannot build feature '{name}' from columns {list(frame)}")
+
+
+def structured_features(frame, features=TENANT_FEATURES):
+    """Dense (n_rows, n_features) matrix built from raw review columns"""
+    return np.column_stack([_feature_column(frame, name) for name in features])
+
+
+def _texts(frame, text_column):
+    return frame[text_column].fillna('').astype(str).to_numpy()
+
+
+def fit_tenant_model(data, features=TENANT_FEATURES, words=TENANT_WORDS,
+                     text_column='review_text', target='score'):
+    """Fit TF-IDF + OrderedModel(logit) and return the scoring artifacts
+
+    The model uses the structured `features` plus the TF-IDF weight of each
+    word in `words`; the defaults are the notebook's Model 3, without text
+    terms. Returns a dict of arrays that `save_model` writes with np.savez.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from statsmodels.miscmodels.ordinal_model import OrderedModel
+
+    X = pd.DataFrame(structured_features(data, features), columns=features, index=data.index)
+    # Without text terms no vocabulary is fitted or stored
+    terms, idf, word_index = np.array([], dtype=str), np.array([]), np.array([], dtype=np.int64)
+    if len(words):
+        vectorizer = TfidfVectorizer().fit(_texts(data, text_column))
+        missing = [word for word in words if word not in vectorizer.vocabulary_]
+        if missing:
+            raise ValueError(f'Words not in the review vocabulary: {missing}')
+        word_index = np.array([vectorizer.vocabulary_[word] for word in words], dtype=np.int64)
+        X[list(words)] = vectorizer.transform(_texts(data, text_column))[:, word_index].toarray()
+
+        terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+        for term, index in vectorizer.vocabulary_.items():
+            terms[index] = term
+        terms, idf = terms.astype(str), vectorizer.idf_
+    result = OrderedModel(data[target], X, distr='logit').fit(method='bfgs', disp=False)
+
+    n_exog = X.shape[1]
+    coef = np.asarray(result.params)[:n_exog]
+    # First cutpoint is stored as is, later ones as log increments
+    thresholds = result.model.transform_threshold_params(np.asarray(result.params))[1:-1]
+
+    return {
+        'terms': terms,
+        'idf': idf,
+        'text_index': word_index,
+        'text_coef': coef[len(features):],
+        'features': np.array(features),
+        'coef': coef[:len(features)],
+        'thresholds': thresholds,
+        'levels': np.asarray(result.model.labels),
+    }
+
+
+def save_model(model, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez(path, **model)
+    return path
+
+
+def load_model(path=MODEL_PATH):
+    with np.load(path, allow_pickle=False) as stored:
+        return {name: stored[name] for name in stored.files}
+
+
+class TenantScorer:
+    """Warm in-process scorer built from saved artifacts
+
+    Construct once (e.g. `TenantScorer.load()`) and reuse: the vectorizer
+    and the sparse text coefficient vector are built at construction, so
+    scoring a single review is one tokenisation plus two dot products. A
+    model without text terms (the default) never tokenises at all.
+    """
+
+    def __init__(self, model, text_column='review_text'):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.text_column = text_column
+        self.features = [str(name) for name in model['features']]
+        self.coef = np.asarray(model['coef'], dtype=np.float64)
+        self.thresholds = np.asarray(model['thresholds'], dtype=np.float64)
+        self.levels = np.asarray(model['levels'])
+
+        terms = model['terms']
+        # (n_terms, 1) column that is zero outside the modelled words
+        self.text_coef = sp.csc_matrix(
+            (np.asarray(model['text_coef'], dtype=np.float64),
+             (np.asarray(model['text_index'], dtype=int), np.zeros(len(model['text_index']), dtype=int))),
+            shape=(len(terms), 1),
+        )
+        self.vectorizer = None
+        if self.text_coef.nnz:
+            self.vectorizer = TfidfVectorizer(vocabulary={str(term): i for i, term in enumerate(terms)})
+            self.vectorizer.idf_ = np.asarray(model['idf'], dtype=np.float64)
+            # Single-review path skips sklearn's per-call validation and CSR assembly
+            self._analyzer = self.vectorizer.build_analyzer()
+            self._idf = self.vectorizer.idf_
+            self._text_coef_dense = self.text_coef.toarray().ravel()
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, **kwargs):
+        return cls(load_model(path), **kwargs)
+
+    def transform_text(self, texts):
+        """l2-normalised CSR TF-IDF matrix over the saved vocabulary"""
+        if self.vectorizer is None:
+            raise ValueError('The model has no text terms, so no vocabulary was saved')
+        return self.vectorizer.transform(texts)
+
+    def linear_predictor(self, frame):
+        linear = structured_features(frame, self.features) @ self.coef
+        if self.vectorizer is not None:
+            tfidf = self.transform_text(_texts(frame, self.text_column))
+            linear += np.asarray((tfidf @ self.text_coef).todense()).ravel()
+        return linear
+
+    def predict_proba(self, frame):
+        """(n_rows, n_levels) probabilities, P(y <= k) = logistic(cut_k - x'b)"""
+        linear = self.linear_predictor(frame)
+        cumulative = 1 / (1 + np.exp(-(self.thresholds[None, :] - linear[:, None])))
+        n = len(linear)
+        cumulative = np.hstack([np.zeros((n, 1)), cumulative, np.ones((n, 1))])
+        return np.diff(cumulative, axis=1)
+
+    def score_frame(self, frame, id_column='review_id'):
+        """Per-level probabilities plus expected and most likely score"""
+        proba = self.predict_proba(frame)
+        scores = pd.DataFrame(proba, columns=[f'p_score_{level}' for level in self.levels], index=frame.index)
+        if np.issubdtype(self.levels.dtype, np.number):
+            scores['expected_score'] = proba @ self.levels.astype(np.float64)
+        scores['predicted_score'] = self.levels[proba.argmax(axis=1)]
+        if id_column in frame.columns:
+            scores.insert(0, id_column, frame[id_column].to_numpy())
+        return scores
+
+    def score_one(self, review_text, **fields):
+        """Score distribution for one review, e.g. score_one(text, weekly_price=650, n_bedrooms=2, suburb='Newtown')"""
+        text_part = 0.0
+        counts = None
+        if self.vectorizer is not None:
+            vocabulary = self.vectorizer.vocabulary
+            counts = Counter(vocabulary[token] for token in self._analyzer(review_text or '') if token in vocabulary)
+        if counts:
+            index = np.fromiter(counts.keys(), dtype=np.int64)
+            weights = np.fromiter(counts.values(), dtype=np.float64) * self._idf[index]
+            text_part = weights @ self._text_coef_dense[index] / np.sqrt(weights @ weights)
+
+        columns = {name: np.array([value]) for name, value in fields.items()}
+        linear = structured_features(columns, self.features)[0] @ self.coef + text_part
+        cumulative = 1 / (1 + np.exp(-(self.thresholds - linear)))
+        proba = np.diff(np.concatenate([[0.0], cumulative, [1.0]]))
+        return dict(zip(self.levels.tolist(), proba.tolist()))
+
+
+def score_csv(path, output_path=None, scorer=None, chunksize=100_000, id_column='review_id'):
+    """Stream a review CSV through the scorer into a Parquet file
+
+    Only one chunk of reviews and its sparse TF-IDF matrix are in memory at
+    a time. Returns the output path.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    scorer = scorer or TenantScorer.load()
+    output_path = output_path or cache_path('tenant', 'scores.parquet')
+
+    writer = None
+    try:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            table = pa.Table.from_pandas(scorer.score_frame(chunk, id_column=id_column), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return output_path